@@ -14,7 +14,7 @@ export default function DocsPage() {
           <div className="mt-4">
             <ul className="list-disc pl-5 text-sm text-[#9aa3b2] space-y-2">
               <li>Authentication: Register or sign in to obtain a JWT token.</li>
-              <li>Monitoring: Start/stop monitoring on server-side paths (default: /tmp/test_ransomguard).</li>
+              <li>Monitoring: Start/stop monitoring on server-side paths (default: the server's RANSOMGUARD_TEST_DIR, /dev/shm/test_ransomguard or /tmp/test_ransomguard).</li>
               <li>Alerts: Generated based on FME and ABT with types Ransomware, RaaS, Suspicious, or Benign.</li>
               <li>WebSocket: Live updates for alerts and file events; reconnection handled automatically.</li>
               <li>Export: Use “Export CSV” in the Alerts table to download current filtered alerts.</li>
@@ -304,7 +304,8 @@ export default function Home() {
 
   const handleStartMonitoring = async () => {
     try {
-      await apiClient.startMonitoring(['/tmp/test_ransomguard']);
+      // No paths: the server watches its configured test directory
+      await apiClient.startMonitoring();
       const status = await apiClient.getMonitoringStatus();
       setMonitoringStatus(status);
     } catch (error) {
@@ -1,198 +1,253 @@
 import asyncio
-import threading
-from datetime import datetime, timedelta
-from typing import Dict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
 import logging
-import time
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import select, delete, func, literal_column, Interval
 
-from .database import SessionLocal
-from .models import Alert, FileEvent
+from .database import engine
+from .models import Alert, FileEvent, SeverityEnum
 from .websocket import manager
+from .metrics_cache import metrics_cache, METRICS_CACHE_KEY, METRICS_CACHE_TTL, recent_alerts, recent_events
+from .counters import alert_deltas, increment_statement, metrics_query, metrics_from_rows
 
 logger = logging.getLogger(__name__)
 
+def _cutoff(db: Session, period: timedelta, now: datetime):
+    """created_at cutoff `period` before `now`, computed server-side where the dialect allows it"""
+    if db.get_bind().dialect.name == "postgresql":
+        # (now() - interval) is a plan-time constant, so Postgres consistently
+        # picks the created_at index instead of a seqscan
+        seconds = int(period.total_seconds())
+        return func.now() - literal_column(f"interval '{seconds} seconds'", Interval)
+    return now - period
+
 class RetentionManager:
     """Manages data retention policies for alerts and events"""
     
-    def __init__(self):
+    def __init__(self, batch_size: int = 5000):
         self.retention_periods = {
             'alerts': timedelta(days=30),  # Keep alerts for 30 days
             'file_events': timedelta(days=7),  # Keep file events for 7 days
             'critical_alerts': timedelta(days=90),  # Keep critical alerts longer
         }
+        self.batch_size = batch_size  # Rows deleted per transaction
         self.running = False
-        self.cleanup_thread = None
+        self.cleanup_task: Optional[asyncio.Task] = None
     
     def start_retention_service(self):
-        """Start the background retention service"""
+        """Start the background retention service on the running event loop"""
         if self.running:
             logger.warning("Retention service is already running")
             return
         
         self.running = True
-        self.cleanup_thread = threading.Thread(target=self._cleanup_loop, daemon=True)
-        self.cleanup_thread.start()
+        self.cleanup_task = asyncio.get_running_loop().create_task(self._cleanup_loop())
         logger.info("Retention service started")
     
-    def stop_retention_service(self):
+    async def stop_retention_service(self):
         """Stop the background retention service"""
         self.running = False
-        if self.cleanup_thread:
-            self.cleanup_thread.join(timeout=5)
+        if self.cleanup_task:
+            self.cleanup_task.cancel()
+            try:
+                await self.cleanup_task
+            except asyncio.CancelledError:
+                pass
+            self.cleanup_task = None
         logger.info("Retention service stopped")
     
-    def _cleanup_loop(self):
-        """Main cleanup loop running in background thread"""
+    async def _cleanup_loop(self):
+        """Main cleanup loop running as an asyncio task"""
+        loop = asyncio.get_running_loop()
         while self.running:
             try:
-                self._perform_cleanup()
+                # SQLAlchemy calls are blocking; keep them off the event loop
+                await loop.run_in_executor(None, self._perform_cleanup)
                 # Run cleanup every 6 hours
-                for _ in range(6 * 60):  # 6 hours * 60 minutes
-                    if not self.running:
-                        break
-                    time.sleep(60)  # Check every minute if we should stop
+                await asyncio.sleep(6 * 3600)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Error in cleanup loop: {e}")
-                time.sleep(300)  # Wait 5 minutes on error
+                await asyncio.sleep(300)  # Wait 5 minutes on error
+    
+    def _delete_in_batches(self, db: Session, model, *criteria) -> int:
+        """Delete matching rows in bounded batches, committing after each one"""
+        deleted = 0
+        while True:
+            # Core DELETE with an id subquery: no ORM session sync and no
+            # primary keys materialized in Python
+            batch = select(model.id).where(*criteria).order_by(model.id).limit(self.batch_size)
+            if model is Alert:
+                groups = db.execute(
+                    select(Alert.severity, Alert.type, func.count())
+                    .where(Alert.id.in_(batch))
+                    .group_by(Alert.severity, Alert.type)
+                ).all()
+            result = db.execute(
+                delete(model)
+                .where(model.id.in_(batch))
+                .execution_options(synchronize_session=False)
+            )
+            if model is Alert and result.rowcount > 0:
+                # Decrement the alert counters in the same transaction as the purge
+                deltas = {name: -count for name, count in alert_deltas(groups).items()}
+                db.execute(increment_statement(db.get_bind().dialect.name, deltas))
+            db.commit()
+            if result.rowcount <= 0:
+                break
+            deleted += result.rowcount
+            if result.rowcount < self.batch_size:
+                break
+        return deleted
     
     def _perform_cleanup(self):
         """Perform the actual data cleanup"""
-        db = SessionLocal()
-        try:
-            now = datetime.now()
-            
-            # Clean up old file events
-            event_cutoff = now - self.retention_periods['file_events']
-            deleted_events = db.query(FileEvent).filter(
-                FileEvent.created_at < event_cutoff
-            ).delete()
+        with Session(engine, expire_on_commit=False) as db:
+            try:
+                # One aware UTC clock reading per cycle, matching stored created_at
+                now = datetime.now(timezone.utc)
             
-            # Clean up old alerts (except critical ones)
-            alert_cutoff = now - self.retention_periods['alerts']
-            critical_cutoff = now - self.retention_periods['critical_alerts']
+                # Clean up old file events
+                event_cutoff = _cutoff(db, self.retention_periods['file_events'], now)
+                deleted_events = self._delete_in_batches(
+                    db, FileEvent,
+                    FileEvent.created_at < event_cutoff
+                )
             
-            deleted_alerts = db.query(Alert).filter(
-                Alert.created_at < alert_cutoff,
-                Alert.severity != 'critical'
-            ).delete()
+                # Clean up old alerts (except critical ones)
+                alert_cutoff = _cutoff(db, self.retention_periods['alerts'], now)
+                critical_cutoff = _cutoff(db, self.retention_periods['critical_alerts'], now)
             
-            # Clean up very old critical alerts
-            deleted_critical = db.query(Alert).filter(
-                Alert.created_at < critical_cutoff,
-                Alert.severity == 'critical'
-            ).delete()
+                deleted_alerts = self._delete_in_batches(
+                    db, Alert,
+                    Alert.created_at < alert_cutoff,
+                    Alert.severity != SeverityEnum.critical
+                )
             
-            db.commit()
+                # Clean up very old critical alerts
+                deleted_critical = self._delete_in_batches(
+                    db, Alert,
+                    Alert.created_at < critical_cutoff,
+                    Alert.severity == SeverityEnum.critical
+                )
             
-            total_deleted = deleted_events + deleted_alerts + deleted_critical
-            if total_deleted > 0:
-                logger.info(f"Cleanup completed: Deleted {total_deleted} old records")
+                total_deleted = deleted_events + deleted_alerts + deleted_critical
+                if total_deleted > 0:
+                    metrics_cache.invalidate()
+                    logger.info(f"Cleanup completed: Deleted {total_deleted} old records")
                 
-        except Exception as e:
-            logger.error(f"Error during cleanup: {e}")
-            db.rollback()
-        finally:
-            db.close()
+            except Exception as e:
+                logger.error(f"Error during cleanup: {e}")
+                db.rollback()
 
 class MetricsUpdater:
     """Periodically updates and broadcasts metrics"""
     
     def __init__(self):
         self.running = False
-        self.metrics_thread = None
+        self.metrics_task: Optional[asyncio.Task] = None
     
     def start_metrics_service(self):
-        """Start the metrics update service"""
+        """Start the metrics update service on the running event loop"""
         if self.running:
             logger.warning("Metrics service is already running")
             return
         
         self.running = True
-        self.metrics_thread = threading.Thread(target=self._metrics_loop, daemon=True)
-        self.metrics_thread.start()
+        self.metrics_task = asyncio.get_running_loop().create_task(self._metrics_loop())
         logger.info("Metrics service started")
     
-    def stop_metrics_service(self):
+    async def stop_metrics_service(self):
         """Stop the metrics update service"""
         self.running = False
-        if self.metrics_thread:
-            self.metrics_thread.join(timeout=5)
+        if self.metrics_task:
+            self.metrics_task.cancel()
+            try:
+                await self.metrics_task
+            except asyncio.CancelledError:
+                pass
+            self.metrics_task = None
         logger.info("Metrics service stopped")
     
-    def _metrics_loop(self):
+    async def _metrics_loop(self):
         """Main metrics update loop"""
         while self.running:
             try:
-                self._update_and_broadcast_metrics()
+                await self._update_and_broadcast_metrics()
                 # Update metrics every 30 seconds
-                for _ in range(30):
-                    if not self.running:
-                        break
-                    time.sleep(1)
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Error in metrics loop: {e}")
-                time.sleep(10)
+                await asyncio.sleep(10)
     
-    def _update_and_broadcast_metrics(self):
+    async def _update_and_broadcast_metrics(self):
         """Calculate current metrics and broadcast to connected users"""
-        db = SessionLocal()
-        try:
-            # Calculate metrics
-            total_alerts = db.query(Alert).count()
-            critical_alerts = db.query(Alert).filter(Alert.severity == 'critical').count()
-            high_alerts = db.query(Alert).filter(Alert.severity == 'high').count()
-            ransomware_alerts = db.query(Alert).filter(Alert.type == 'Ransomware').count()
-            raas_alerts = db.query(Alert).filter(Alert.type == 'RaaS').count()
-            
-            # Get recent activity
-            recent_alerts = db.query(Alert).filter(
-                Alert.created_at > datetime.now() - timedelta(hours=1)
-            ).count()
-            
-            recent_events = db.query(FileEvent).filter(
-                FileEvent.created_at > datetime.now() - timedelta(hours=1)
-            ).count()
-            
-            metrics = {
-                "total_alerts": total_alerts,
-                "critical_alerts": critical_alerts,
-                "high_alerts": high_alerts,
-                "ransomware_alerts": ransomware_alerts,
-                "raas_alerts": raas_alerts,
-                "recent_alerts": recent_alerts,
-                "recent_events": recent_events,
-                "timestamp": datetime.now().isoformat()
-            }
-            # Avoid attempting to schedule asyncio tasks from a non-async thread.
-            # Metrics are available via REST; broadcasting can be added via a thread-safe queue if needed.
-            logger.debug(f"Metrics updated: {metrics}")
+        loop = asyncio.get_running_loop()
+        metrics = await loop.run_in_executor(None, self._calculate_metrics)
+        if metrics is None:
+            return
+        for user_email in list(manager.user_connections):
+            manager.broadcast_metrics_update(metrics, user_email)
+    
+    def _calculate_metrics(self) -> Optional[Dict]:
+        """Calculate current metrics (blocking; runs in the default executor)"""
+        with Session(engine, expire_on_commit=False) as db:
+            try:
+                cache_version = metrics_cache.version
+                now = datetime.now(timezone.utc)
+
+                # Severity/type totals come from the maintained counters
+                counts = metrics_from_rows(db.execute(metrics_query()).all())
+
+                # Share the counts with the REST endpoint so reads between cycles are free
+                metrics_cache.put(METRICS_CACHE_KEY, counts, METRICS_CACHE_TTL, version=cache_version)
+
+                metrics = {
+                    **counts,
+                    # Fed at insert time; no recent-hour scans per cycle
+                    "recent_alerts": recent_alerts.count(),
+                    "recent_events": recent_events.count(),
+                    "timestamp": now.isoformat()
+                }
+                logger.debug(f"Metrics updated: {metrics}")
+                return metrics
             
-        except Exception as e:
-            logger.error(f"Error updating metrics: {e}")
-        finally:
-            db.close()
+            except Exception as e:
+                logger.error(f"Error updating metrics: {e}")
+                return None
+
+def warm_recent_activity(db: Session):
+    """Seed the recent-hour counters from the database on process start"""
+    hour_ago = _cutoff(db, timedelta(hours=1), datetime.now(timezone.utc))
+    recent_alerts.warm(db.execute(select(Alert.created_at).where(Alert.created_at > hour_ago)).scalars())
+    recent_events.warm(db.execute(select(FileEvent.created_at).where(FileEvent.created_at > hour_ago)).scalars())
 
 # Global instances
 retention_manager = RetentionManager()
 metrics_updater = MetricsUpdater()
 
 def start_background_services():
-    """Start all background services"""
+    """Start all background services; must be called from the running event loop"""
+    manager.start_broadcaster()
     retention_manager.start_retention_service()
     metrics_updater.start_metrics_service()
     logger.info("All background services started")
 
-def stop_background_services():
+async def stop_background_services():
     """Stop all background services"""
-    retention_manager.stop_retention_service()
-    metrics_updater.stop_metrics_service()
+    await retention_manager.stop_retention_service()
+    await metrics_updater.stop_metrics_service()
+    await manager.stop_broadcaster()
     logger.info("All background services stopped")
 
 def get_background_services_status():
     """Get status of background services"""
     return {
         "retention": "running" if retention_manager.running else "stopped",
-        "metrics": "running" if metrics_updater.running else "stopped"
+        "metrics": "running" if metrics_updater.running else "stopped",
+        "broadcaster": "running" if manager.broadcast_task is not None else "stopped"
     }
@@ -0,0 +1,100 @@
+from collections import Counter
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.orm import Session
+
+from .database import dialect_insert, SCHEMA_LOCK_ID
+from .models import Alert, MetricCounter, SeverityEnum, AlertTypeEnum
+
+TOTAL_ALERTS = "alerts:total"
+
+def severity_counter(severity: SeverityEnum) -> str:
+    return f"alerts:severity:{SeverityEnum(severity).value}"
+
+def type_counter(alert_type: AlertTypeEnum) -> str:
+    return f"alerts:type:{AlertTypeEnum(alert_type).value}"
+
+# Counter names backing MetricsResponse
+METRICS_COUNTERS = {
+    "total_alerts": TOTAL_ALERTS,
+    "critical_alerts": severity_counter(SeverityEnum.critical),
+    "high_alerts": severity_counter(SeverityEnum.high),
+    "ransomware_alerts": type_counter(AlertTypeEnum.ransomware),
+    "raas_alerts": type_counter(AlertTypeEnum.raas),
+}
+
+def alert_deltas(groups: Iterable[Tuple[SeverityEnum, AlertTypeEnum, int]]) -> Dict[str, int]:
+    """Counter deltas for (severity, type, count) groups of alerts"""
+    deltas = Counter()
+    for severity, alert_type, count in groups:
+        deltas[TOTAL_ALERTS] += count
+        deltas[severity_counter(severity)] += count
+        deltas[type_counter(alert_type)] += count
+    return dict(deltas)
+
+def deltas_for_alerts(alerts: Iterable[Alert]) -> Dict[str, int]:
+    """Counter deltas for newly inserted alerts"""
+    return alert_deltas((alert.severity, alert.type, 1) for alert in alerts)
+
+def increment_statement(dialect_name: str, deltas: Dict[str, int]):
+    """INSERT ... ON CONFLICT DO UPDATE SET value = value + delta for each counter"""
+    insert = dialect_insert(dialect_name)
+    stmt = insert(MetricCounter).values(
+        [{"name": name, "value": delta} for name, delta in deltas.items()]
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[MetricCounter.name],
+        set_={"value": MetricCounter.value + stmt.excluded.value},
+    )
+
+def assign_statement(dialect_name: str, values: Dict[str, int]):
+    """INSERT ... ON CONFLICT DO UPDATE SET value = excluded.value for each counter"""
+    insert = dialect_insert(dialect_name)
+    stmt = insert(MetricCounter).values(
+        [{"name": name, "value": value} for name, value in values.items()]
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[MetricCounter.name],
+        set_={"value": stmt.excluded.value},
+    )
+
+def metrics_query():
+    """Primary-key lookup of the counters behind MetricsResponse"""
+    return select(MetricCounter.name, MetricCounter.value).where(
+        MetricCounter.name.in_(METRICS_COUNTERS.values())
+    )
+
+def metrics_from_rows(rows: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+    """Map counter rows onto MetricsResponse fields, defaulting missing counters to 0"""
+    values = dict(rows)
+    return {field: values.get(name, 0) for field, name in METRICS_COUNTERS.items()}
+
+def resync_alert_counters(db: Session):
+    """Rebuild all alert counters from a single grouped scan of alerts
+
+    Counters are overwritten with absolute values in the scan's transaction, so
+    workers resyncing at the same time can't add their totals on top of each other.
+    """
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        # Same lock as init_db; held until commit, so workers resync one at a time
+        db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+    # Lock the existing counter rows before scanning: a concurrent insert's
+    # increment then waits for this commit and lands on top of the rebuilt value
+    db.execute(
+        select(MetricCounter.name).where(MetricCounter.name.like("alerts:%")).with_for_update()
+    )
+    groups = db.execute(
+        select(Alert.severity, Alert.type, func.count()).group_by(Alert.severity, Alert.type)
+    ).all()
+    values = alert_deltas(groups)
+    db.execute(
+        delete(MetricCounter).where(
+            MetricCounter.name.like("alerts:%"),
+            MetricCounter.name.not_in(list(values)),
+        )
+    )
+    if values:
+        db.execute(assign_statement(dialect_name, values))
+    db.commit()
@@ -1,42 +1,62 @@
-from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, Body
+from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, Body, Query
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from datetime import datetime, timedelta
 from typing import List, Optional
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
-from jose import JWTError, jwt
+import orjson
+from jose import JWTError
 
-from .database import get_db, engine
-from .models import Base, User, Alert, FileEvent, SeverityEnum, AlertTypeEnum
+from .database import get_db, init_db, AsyncSessionLocal, dialect_insert, AUTO_CREATE_TABLES
+from .models import User, Alert, FileEvent, SeverityEnum, AlertTypeEnum
 from .schemas import (
     UserCreate,
     UserResponse,
     Token,
     AlertResponse,
     AlertCreate,
+    BulkAlertSpec,
     FileEventResponse,
     FileEventCreate,
     MetricsResponse,
 )
-from .auth import authenticate_user, create_access_token, get_current_user, get_password_hash, SECRET_KEY, ALGORITHM
+from .auth import authenticate_user, create_access_token, decode_token, get_current_user, get_password_hash
 from .monitoring import start_file_monitoring, stop_file_monitoring, get_monitoring_status
 from .websocket import manager
-from .background_jobs import start_background_services, stop_background_services, get_background_services_status
+from .metrics_cache import metrics_cache, METRICS_CACHE_KEY, METRICS_CACHE_TTL, recent_alerts, recent_events
+from .counters import deltas_for_alerts, increment_statement, metrics_query, metrics_from_rows, resync_alert_counters
+from .background_jobs import start_background_services, stop_background_services, get_background_services_status, warm_recent_activity
 
-Base.metadata.create_all(bind=engine)
+# Upper bound on alerts created by one /test/alerts/bulk call
+BULK_TEST_ALERT_LIMIT = 1000
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Start background services
+    # Startup: Create tables if enabled, seed alert counters and the recent-hour
+    # windows from existing rows, then start background services
+    if AUTO_CREATE_TABLES:
+        await init_db()
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(resync_alert_counters)
+        await db.run_sync(warm_recent_activity)
     start_background_services()
     yield
     # Shutdown: Stop all services
-    stop_background_services()
-    stop_file_monitoring()
+    await stop_background_services()
+    await run_in_threadpool(stop_file_monitoring)
 
-app = FastAPI(title="RansomGuard API", version="1.0.0", lifespan=lifespan)
+app = FastAPI(
+    title="RansomGuard API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -48,30 +68,43 @@ app.add_middleware(
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+@app.get("/health")
+async def health():
+    """Unauthenticated readiness probe; answers once startup has completed"""
+    return {"status": "ok"}
+
 @app.post("/register", response_model=UserResponse)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    # bcrypt is CPU-bound; hash in the executor so the event loop keeps serving
+    hashed_password = await asyncio.get_running_loop().run_in_executor(
+        None, get_password_hash, user.password
+    )
+    # Single INSERT ... ON CONFLICT DO NOTHING RETURNING: one round-trip and
+    # no window between the existence check and the insert
+    insert = dialect_insert(db.bind.dialect.name)
+    stmt = (
+        insert(User)
+        .values(
+            email=user.email,
+            hashed_password=hashed_password,
+            first_name=user.first_name,
+            last_name=user.last_name
+        )
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
+    )
+    db_user = (await db.execute(stmt)).scalars().first()
+    if db_user is None:
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
-    
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
-        email=user.email,
-        hashed_password=hashed_password,
-        first_name=user.first_name,
-        last_name=user.last_name
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     return db_user
 
 @app.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -90,49 +123,50 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
 
 @app.get("/alerts", response_model=List[AlertResponse])
 async def get_alerts(
-    skip: int = 0,
-    limit: int = 100,
-    severity: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=500),
+    severity: Optional[SeverityEnum] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(Alert)
+    # Keyset pagination, newest first: pass the last id seen as after_id
+    query = select(Alert)
     if severity:
-        query = query.filter(Alert.severity == severity)
-    alerts = query.offset(skip).limit(limit).all()
+        query = query.where(Alert.severity == severity)
+    if after_id is not None:
+        query = query.where(Alert.id < after_id)
+    alerts = (await db.execute(query.order_by(Alert.id.desc()).limit(limit))).scalars().all()
     return alerts
 
 @app.get("/file-events", response_model=List[FileEventResponse])
 async def get_file_events(
-    skip: int = 0,
-    limit: int = 50,
+    after_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    events = db.query(FileEvent).offset(skip).limit(limit).all()
+    # Keyset pagination, newest first: pass the last id seen as after_id
+    query = select(FileEvent)
+    if after_id is not None:
+        query = query.where(FileEvent.id < after_id)
+    events = (await db.execute(query.order_by(FileEvent.id.desc()).limit(limit))).scalars().all()
     return events
 
 @app.get("/metrics", response_model=MetricsResponse)
-async def get_metrics(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    total_alerts = db.query(Alert).count()
-    critical_alerts = db.query(Alert).filter(Alert.severity == SeverityEnum.critical).count()
-    high_alerts = db.query(Alert).filter(Alert.severity == SeverityEnum.high).count()
-    ransomware_alerts = db.query(Alert).filter(Alert.type == AlertTypeEnum.ransomware).count()
-    raas_alerts = db.query(Alert).filter(Alert.type == AlertTypeEnum.raas).count()
-    
-    return MetricsResponse(
-        total_alerts=total_alerts,
-        critical_alerts=critical_alerts,
-        high_alerts=high_alerts,
-        ransomware_alerts=ransomware_alerts,
-        raas_alerts=raas_alerts
-    )
+async def get_metrics(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    async def compute():
+        # Counters are maintained on insert and purge, so this is a primary-key lookup
+        rows = (await db.execute(metrics_query())).all()
+        return metrics_from_rows(rows)
+
+    counts = await metrics_cache.aget_or_compute(METRICS_CACHE_KEY, METRICS_CACHE_TTL, compute)
+    return MetricsResponse(**counts)
 
 @app.post("/alerts", response_model=AlertResponse)
 async def create_alert(
     alert: AlertCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     db_alert = Alert(
         host=alert.host,
@@ -143,16 +177,18 @@ async def create_alert(
         type=alert.type
     )
     db.add(db_alert)
-    db.commit()
-    db.refresh(db_alert)
-    await manager.broadcast_new_alert(db_alert, current_user.email)
+    await db.execute(increment_statement(db.bind.dialect.name, deltas_for_alerts([db_alert])))
+    await db.commit()
+    metrics_cache.invalidate()
+    recent_alerts.record()
+    manager.broadcast_new_alert(db_alert, current_user.email)
     return db_alert
 
 @app.post("/file-events", response_model=FileEventResponse)
 async def create_file_event(
     event: FileEventCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     db_event = FileEvent(
         path=event.path,
@@ -160,9 +196,9 @@ async def create_file_event(
         fme=event.fme
     )
     db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
-    await manager.broadcast_new_file_event(db_event, current_user.email)
+    await db.commit()
+    recent_events.record()
+    manager.broadcast_new_file_event(db_event, current_user.email)
     return db_event
 
 @app.websocket("/ws/{user_email}")
@@ -173,7 +209,7 @@ async def websocket_endpoint(websocket: WebSocket, user_email: str):
         await websocket.close(code=1008)
         return
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email = payload.get("sub")
         if email is None or email != user_email:
             await websocket.close(code=1008)
@@ -188,9 +224,8 @@ async def websocket_endpoint(websocket: WebSocket, user_email: str):
             raw = await websocket.receive_text()
             # Echo back received messages for connectivity checks
             try:
-                import json as _json
-                parsed = _json.loads(raw)
-            except Exception:
+                parsed = orjson.loads(raw)
+            except orjson.JSONDecodeError:
                 parsed = {"message": raw}
             await manager.send_personal_message({"type": "echo", "data": parsed}, websocket)
     except WebSocketDisconnect:
@@ -202,7 +237,9 @@ async def start_monitoring_endpoint(
     current_user: User = Depends(get_current_user)
 ):
     """Start file system monitoring"""
-    success = start_file_monitoring(paths)
+    # Monitor control opens sessions, joins threads and takes the ABT lock;
+    # keep it off the event loop
+    success = await run_in_threadpool(start_file_monitoring, paths)
     if success:
         return {"status": "started", "message": "File monitoring started successfully"}
     else:
@@ -211,43 +248,76 @@ async def start_monitoring_endpoint(
 @app.post("/monitoring/stop")
 async def stop_monitoring_endpoint(current_user: User = Depends(get_current_user)):
     """Stop file system monitoring"""
-    stop_file_monitoring()
+    await run_in_threadpool(stop_file_monitoring)
     return {"status": "stopped", "message": "File monitoring stopped"}
 
 @app.get("/monitoring/status")
 async def get_monitoring_status_endpoint(current_user: User = Depends(get_current_user)):
     """Get current monitoring status"""
-    status = get_monitoring_status()
+    status = await run_in_threadpool(get_monitoring_status)
     status["background_services"] = get_background_services_status()
     return status
 
-@app.post("/test/alert")
-async def create_test_alert(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Create a test alert for demonstration"""
+def _random_test_alert(
+    severity: Optional[SeverityEnum] = None,
+    alert_type: Optional[AlertTypeEnum] = None
+) -> Alert:
+    """Build an unsaved demo alert, randomizing any field not given"""
     import random
-    from .models import SeverityEnum, AlertTypeEnum
     
-    test_alert = Alert(
+    return Alert(
         host=f"test-host-{random.randint(1, 5)}",
         path=f"/test/file_{random.randint(1000, 9999)}.enc",
-        severity=random.choice(list(SeverityEnum)),
+        severity=severity or random.choice(list(SeverityEnum)),
         fme=random.uniform(5.0, 8.5),
         abt=random.uniform(2.0, 5.0),
-        type=random.choice(list(AlertTypeEnum))
+        type=alert_type or random.choice(list(AlertTypeEnum))
     )
+
+@app.post("/test/alert")
+async def create_test_alert(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create a test alert for demonstration"""
+    test_alert = _random_test_alert()
     db.add(test_alert)
-    db.commit()
-    db.refresh(test_alert)
-    await manager.broadcast_new_alert(test_alert, current_user.email)
+    await db.execute(increment_statement(db.bind.dialect.name, deltas_for_alerts([test_alert])))
+    await db.commit()
+    metrics_cache.invalidate()
+    recent_alerts.record()
+    manager.broadcast_new_alert(test_alert, current_user.email)
     return test_alert
 
+@app.post("/test/alerts/bulk", response_model=List[AlertResponse])
+async def create_test_alerts_bulk(
+    specs: List[BulkAlertSpec] = Body(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create several test alerts in one request and one transaction"""
+    if len(specs) > BULK_TEST_ALERT_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BULK_TEST_ALERT_LIMIT} alerts per request"
+        )
+    if not specs:
+        return []
+    
+    test_alerts = [_random_test_alert(spec.severity, spec.type) for spec in specs]
+    db.add_all(test_alerts)
+    await db.execute(increment_statement(db.bind.dialect.name, deltas_for_alerts(test_alerts)))
+    await db.commit()
+    metrics_cache.invalidate()
+    for test_alert in test_alerts:
+        recent_alerts.record()
+        manager.broadcast_new_alert(test_alert, current_user.email)
+    return test_alerts
+
 @app.post("/test/file-event")
 async def create_test_file_event(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a test file event for demonstration"""
     import random
@@ -259,9 +329,9 @@ async def create_test_file_event(
         fme=random.uniform(0.0, 8.0)
     )
     db.add(test_event)
-    db.commit()
-    db.refresh(test_event)
-    await manager.broadcast_new_file_event(test_event, current_user.email)
+    await db.commit()
+    recent_events.record()
+    manager.broadcast_new_file_event(test_event, current_user.email)
     return test_event
 
 if __name__ == "__main__":
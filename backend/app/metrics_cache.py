@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+METRICS_CACHE_KEY = "metrics:v1"
+METRICS_CACHE_TTL = 60  # seconds
+
+class MetricsCache:
+    """Process-wide TTL cache for expensive metrics queries"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Current invalidation version"""
+        return self._version
+
+    def _versioned_key(self, key: str, version: int) -> str:
+        return f"{key}:{version}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(self._versioned_key(key, self._version))
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry[1]
+
+    def put(self, key: str, value: Any, ttl: float, version: Optional[int] = None):
+        """Store a value; skipped if the cache was invalidated since `version` was read"""
+        with self._lock:
+            if version is not None and version != self._version:
+                return
+            self._entries[self._versioned_key(key, self._version)] = (time.monotonic() + ttl, value)
+
+    def get_or_compute(self, key: str, ttl: float, fn: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and storing it on a miss"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        version = self._version
+        value = fn()
+        self.put(key, value, ttl, version=version)
+        return value
+
+    async def aget_or_compute(self, key: str, ttl: float, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of get_or_compute for coroutine producers"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        version = self._version
+        value = await fn()
+        self.put(key, value, ttl, version=version)
+        return value
+
+    def invalidate(self):
+        """Drop all entries by bumping the version appended to every key"""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+class RecentActivityWindow:
+    """Sliding-window insert counter fed at insert time, read in O(1)
+
+    Timestamps are grouped into fixed buckets so memory stays bounded during
+    bursts; counts are exact to within one bucket at the window's trailing edge.
+    """
+
+    def __init__(self, window_seconds: int = 3600, bucket_seconds: int = 60):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self._buckets: deque = deque()  # [bucket_start, count], oldest first
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._buckets and self._buckets[0][0] + self.bucket_seconds <= cutoff:
+            self._total -= self._buckets.popleft()[1]
+
+    def record(self, timestamp: Optional[float] = None):
+        """Count one insert at `timestamp` (epoch seconds, default now)"""
+        now = time.time()
+        ts = now if timestamp is None else timestamp
+        bucket = ts - ts % self.bucket_seconds
+        with self._lock:
+            if self._buckets and self._buckets[-1][0] >= bucket:
+                self._buckets[-1][1] += 1
+            else:
+                self._buckets.append([bucket, 1])
+            self._total += 1
+            self._trim(now)
+
+    def count(self) -> int:
+        """Inserts within the window"""
+        with self._lock:
+            self._trim(time.time())
+            return self._total
+
+    def warm(self, created_at: Iterable[datetime]):
+        """Replace the window contents with existing row timestamps"""
+        timestamps = sorted(
+            (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+            for dt in created_at
+        )
+        with self._lock:
+            self._buckets.clear()
+            self._total = 0
+        for ts in timestamps:
+            self.record(ts)
+
+# Global metrics cache
+metrics_cache = MetricsCache()
+
+# Recent-hour insert counters for the metrics broadcast
+recent_alerts = RecentActivityWindow()
+recent_events = RecentActivityWindow()
@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Enum, Boolean, Index
 from sqlalchemy.sql import func
+from datetime import datetime, timezone
 from .database import Base
 import enum
 
+def _utcnow():
+    return datetime.now(timezone.utc)
+
 class SeverityEnum(str, enum.Enum):
     info = "info"
     low = "low"
@@ -21,6 +25,10 @@ class FileActionEnum(str, enum.Enum):
     modified = "modified"
     deleted = "deleted"
 
+def _string_enum(enum_cls):
+    """VARCHAR(16)-backed enum: no Postgres ENUM type to resolve on insert/filter"""
+    return Enum(enum_cls, native_enum=False, create_constraint=False, length=16, validate_strings=True)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -38,17 +46,32 @@ class Alert(Base):
     id = Column(Integer, primary_key=True, index=True)
     host = Column(String, nullable=False)
     path = Column(String, nullable=False)
-    severity = Column(Enum(SeverityEnum), nullable=False)
+    severity = Column(_string_enum(SeverityEnum), nullable=False)
     fme = Column(Float, nullable=False)
     abt = Column(Float, nullable=False)
-    type = Column(Enum(AlertTypeEnum), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    type = Column(_string_enum(AlertTypeEnum), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, index=True)
+
+    # Cover the metrics aggregates and retention purges; postgresql_include
+    # lets Postgres answer them with index-only scans. severity and type are
+    # plain VARCHAR(16) columns, so these stay simple b-tree comparisons
+    __table_args__ = (
+        Index('ix_alert_sev_created', 'severity', 'created_at', postgresql_include=['id']),
+        Index('ix_alert_type', 'type', postgresql_include=['id']),
+        Index('ix_alert_sev_type', 'severity', 'type', postgresql_include=['id']),
+    )
 
 class FileEvent(Base):
     __tablename__ = "file_events"
     
     id = Column(Integer, primary_key=True, index=True)
     path = Column(String, nullable=False)
-    action = Column(Enum(FileActionEnum), nullable=False)
+    action = Column(_string_enum(FileActionEnum), nullable=False, index=True)
     fme = Column(Float, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), default=_utcnow, index=True)
+
+class MetricCounter(Base):
+    __tablename__ = "counters"
+    
+    name = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
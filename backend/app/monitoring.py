@@ -1,21 +1,109 @@
 import os
+import socket
 import time
 import math
 import hashlib
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 from typing import Dict, List, Optional, Tuple
 import threading
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
 import logging
+import numpy as np
 from sqlalchemy.orm import Session
 
 from .database import SessionLocal
 from .models import Alert, FileEvent, SeverityEnum, AlertTypeEnum, FileActionEnum
 from .schemas import AlertResponse, FileEventResponse
+from .metrics_cache import metrics_cache, recent_alerts, recent_events
+from .counters import deltas_for_alerts, increment_statement
+
+try:
+    from . import _entropy  # C kernel, built with `python setup.py build_ext --inplace`
+except ImportError:  # not built; the numba/numpy kernels are used instead
+    _entropy = None
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the numpy kernel is used instead
+    njit = None
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional; the monitor falls back to polling
+    FileSystemEventHandler = object
+    Observer = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+EVENT_QUEUE_SIZE = 10_000  # Analyzed events awaiting a DB write
+WRITER_BATCH_SIZE = 200  # Events per commit
+WRITER_FLUSH_INTERVAL = 0.2  # seconds
+DISPATCH_BATCH_SIZE = 64  # Raw events analyzed per tick; caps in-flight entropy reads
+DISPATCH_INTERVAL = 0.05  # seconds
+IO_POOL_WORKERS = min(8, os.cpu_count() or 1)
+
+# Resolved once; the host doesn't change for the life of the process
+_HOSTNAME = socket.gethostname()
+# Default watch path, shared with the test scripts' fixture directory
+# (test_helpers.TEST_DIR); tmpfs where available
+TEST_WATCH_DIR = os.getenv(
+    "RANSOMGUARD_TEST_DIR",
+    "/dev/shm/test_ransomguard" if os.path.isdir("/dev/shm") else "/tmp/test_ransomguard",
+)
+
+# c*log2(c) for every count a default-sized file sample (3 x 8192 bytes) can hold
+_LUT_MAX_N = 3 * 8192
+_C_LOG2_C = np.zeros(_LUT_MAX_N + 1)
+_C_LOG2_C[1:] = np.arange(1, _LUT_MAX_N + 1) * np.log2(np.arange(1, _LUT_MAX_N + 1))
+
+def _entropy_numpy(arr: np.ndarray) -> float:
+    """Shannon entropy of a uint8 array via bincount"""
+    n = arr.size
+    counts = np.bincount(arr, minlength=256)
+    if n <= _LUT_MAX_N:
+        # p*log2(p) = (c/n)(log2(c) - log2(n)), so H = log2(n) - sum(c*log2(c))/n:
+        # one table gather and a single log2 instead of 256 of them
+        return max(0.0, math.log2(n) - float(_C_LOG2_C[counts].sum()) / n)
+    
+    # float32 doubles the SIMD lanes; its precision is ample for thresholds at 6.0/7.5
+    counts = counts.astype(np.int32)
+    # Branchless over all 256 bins: empty bins give 0*log2(0) = nan, masked to 0
+    p = counts.astype(np.float32) * np.float32(1.0 / n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.nan_to_num(p * np.log2(p), nan=0.0, neginf=0.0)
+    # Clamp the -0.0 a single-valued buffer sums to
+    return max(0.0, float(-terms.sum()))
+
+if njit is not None:
+    # nogil: the compiled loop touches no Python objects, so the fme-io pool and
+    # the API threads aren't serialized behind it
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _entropy_kernel(buf):
+        """Fused histogram + entropy reduction in one compiled pass"""
+        counts = np.zeros(256, np.int64)
+        for i in range(buf.size):
+            counts[buf[i]] += 1
+        inv_n = 1.0 / buf.size
+        s = 0.0
+        for b in range(256):
+            c = counts[b]
+            if c:
+                p = c * inv_n
+                s -= p * math.log2(p)
+        return s
+    
+    # Compile at import so the first file event isn't penalized
+    _entropy_kernel(np.zeros(1, dtype=np.uint8))
+else:
+    _entropy_kernel = _entropy_numpy
+
 class FileMutationEntropy:
     """Calculate File Mutation Entropy (FME) for ransomware detection"""
     
@@ -25,87 +113,119 @@ class FileMutationEntropy:
         if not data:
             return 0.0
         
-        # Count byte frequencies
-        byte_counts = [0] * 256
-        for byte in data:
-            byte_counts[byte] += 1
-        
-        # Calculate entropy
-        entropy = 0.0
-        data_len = len(data)
-        
-        for count in byte_counts:
-            if count > 0:
-                frequency = count / data_len
-                entropy -= frequency * math.log2(frequency)
-        
-        return entropy
+        if _entropy is not None:
+            return _entropy.shannon(data)
+        return float(_entropy_kernel(np.frombuffer(data, dtype=np.uint8)))
     
     @staticmethod
     def calculate_file_entropy(file_path: str, sample_size: int = 8192) -> float:
-        """Calculate entropy of a file by sampling"""
+        """Calculate entropy of a file by sampling; unchanged files are served from cache"""
         try:
-            with open(file_path, 'rb') as f:
-                # Read sample from beginning, middle, and end
-                file_size = os.path.getsize(file_path)
-                if file_size == 0:
-                    return 0.0
-                
-                samples = []
-                sample_positions = [0, file_size // 2, max(0, file_size - sample_size)]
-                
-                for pos in sample_positions:
-                    f.seek(pos)
-                    sample = f.read(min(sample_size, file_size - pos))
-                    samples.append(sample)
-                
-                combined_sample = b''.join(samples)
-                return FileMutationEntropy.calculate_entropy(combined_sample)
+            st = os.stat(file_path)
+            return _entropy_for_stat(file_path, st.st_mtime_ns, st.st_size, sample_size)
         except Exception as e:
             logger.error(f"Error calculating entropy for {file_path}: {e}")
             return 0.0
 
+@lru_cache(maxsize=2048)
+def _entropy_for_stat(file_path: str, mtime_ns: int, file_size: int, sample_size: int) -> float:
+    """Sampled file entropy, memoized on (path, mtime, size)"""
+    if file_size == 0:
+        return 0.0
+    
+    # Read samples from beginning, middle, and end straight into one buffer:
+    # positional reads skip the seeks and there's no join copy
+    buf = bytearray(3 * sample_size)
+    view = memoryview(buf)
+    total = 0
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            # Sampled access; don't let the kernel read ahead the whole file
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_RANDOM)
+        for pos in (0, file_size // 2, max(0, file_size - sample_size)):
+            length = min(sample_size, file_size - pos)
+            total += os.preadv(fd, [view[total:total + length]], pos)
+    finally:
+        os.close(fd)
+    
+    return FileMutationEntropy.calculate_entropy(view[:total])
+
 class AdaptiveBurstThreshold:
-    """Adaptive Burst Threshold (ABT) algorithm for detecting rapid file changes"""
+    """Adaptive Burst Threshold (ABT) algorithm for detecting rapid file changes
+
+    Only add_event takes the lock. After each change it publishes an immutable
+    (generation, count, recent_fmes) snapshot that readers load lock-free; a
+    single attribute load is atomic in CPython.
+    """
+    
+    TAIL_SIZE = 10  # Most recent FMEs kept in the snapshot
     
     def __init__(self, window_size: int = 60, burst_multiplier: float = 3.0):
         self.window_size = window_size  # seconds
         self.burst_multiplier = burst_multiplier
-        self.file_events: List[Tuple[datetime, str]] = []
-        self.lock = threading.Lock()
+        self.file_events: deque = deque()  # (monotonic_ns, path, fme), oldest first
+        self.lock = threading.Lock()  # Serializes writers only
+        self._generation = 0
+        self._snapshot: Tuple[int, int, Tuple[float, ...]] = (0, 0, ())
+        # The window only changes in add_event, so the ABT is memoized per generation
+        self._cached_abt: Tuple[int, float] = (-1, 2.0)
     
-    def add_event(self, file_path: str):
-        """Add a file event to the tracking window"""
+    def add_event(self, file_path: str, fme: float = 0.0, now_ns: Optional[int] = None):
+        """Add a file event, with its already-computed FME, to the tracking window
+
+        `now_ns` lets batch callers share one monotonic_ns() reading per tick.
+        """
+        if now_ns is None:
+            # Monotonic int timestamps: cheap to take and compare, immune to clock jumps
+            now_ns = time.monotonic_ns()
         with self.lock:
-            now = datetime.now()
-            self.file_events.append((now, file_path))
+            events = self.file_events
+            events.append((now_ns, file_path, fme))
+            self._generation += 1
+            
+            # Remove old events outside the window; only expired ones are visited
+            cutoff_ns = now_ns - self.window_size * 1_000_000_000
+            while events and events[0][0] <= cutoff_ns:
+                events.popleft()
             
-            # Remove old events outside the window
-            cutoff_time = now - timedelta(seconds=self.window_size)
-            self.file_events = [(t, p) for t, p in self.file_events if t > cutoff_time]
+            tail = tuple(f for _, _, f in islice(reversed(events), self.TAIL_SIZE))
+            self._snapshot = (self._generation, len(events), tail)
+    
+    @property
+    def event_count(self) -> int:
+        """Events in the current window"""
+        return self._snapshot[1]
+    
+    @property
+    def recent_fmes(self) -> Tuple[float, ...]:
+        """FMEs of the most recent events, newest first"""
+        return self._snapshot[2]
     
     def calculate_abt(self) -> float:
         """Calculate the current Adaptive Burst Threshold"""
-        with self.lock:
-            if len(self.file_events) < 10:
-                return 2.0  # Default threshold for low activity
-            
+        generation, count, _ = self._snapshot
+        cached_generation, abt = self._cached_abt
+        if cached_generation == generation:
+            return abt
+        
+        if count < 10:
+            abt = 2.0  # Default threshold for low activity
+        else:
             # Calculate baseline rate (events per second)
-            recent_events = len(self.file_events)
-            baseline_rate = recent_events / self.window_size
-            
-            # Calculate burst threshold
-            abt = baseline_rate * self.burst_multiplier
+            baseline_rate = count / self.window_size
             
-            # Apply minimum and maximum bounds
-            return max(1.0, min(10.0, abt))
+            # Calculate burst threshold, within minimum and maximum bounds
+            abt = max(1.0, min(10.0, baseline_rate * self.burst_multiplier))
+        
+        # Racing readers compute the same value for a generation; either store wins
+        self._cached_abt = (generation, abt)
+        return abt
     
     def is_burst_detected(self) -> bool:
         """Check if current activity exceeds burst threshold"""
-        with self.lock:
-            current_rate = len(self.file_events) / max(1, self.window_size)
-            abt = self.calculate_abt()
-            return current_rate > abt
+        current_rate = self.event_count / max(1, self.window_size)
+        return current_rate > self.calculate_abt()
 
 class RansomwareDetector:
     """Main ransomware detection engine"""
@@ -113,12 +233,13 @@ class RansomwareDetector:
     def __init__(self):
         self.fme_calculator = FileMutationEntropy()
         self.abt_algorithm = AdaptiveBurstThreshold()
-        self.suspicious_extensions = {'.enc', '.locked', '.crypted', '.crypto', '.ransom'}
+        self.suspicious_extensions = frozenset({'.enc', '.locked', '.crypted', '.crypto', '.ransom'})
         self.high_entropy_threshold = 7.5
         self.medium_entropy_threshold = 6.0
         
-    def analyze_file_change(self, file_path: str, action: str) -> Tuple[bool, Dict]:
-        """Analyze a file change for ransomware indicators"""
+    def analyze_file_change(self, file_path: str, action: str, fme: Optional[float] = None,
+                            now_ns: Optional[int] = None) -> Tuple[bool, Dict]:
+        """Analyze a file change for ransomware indicators; `fme` skips the read if already known"""
         result = {
             'is_ransomware': False,
             'is_suspicious': False,
@@ -130,16 +251,19 @@ class RansomwareDetector:
         }
         
         # Calculate FME
-        fme = self.fme_calculator.calculate_file_entropy(file_path)
+        if fme is None:
+            fme = self.fme_calculator.calculate_file_entropy(file_path)
         result['fme'] = fme
         
         # Update ABT
-        self.abt_algorithm.add_event(file_path)
+        self.abt_algorithm.add_event(file_path, fme, now_ns)
         abt = self.abt_algorithm.calculate_abt()
         result['abt'] = abt
         
         # Check for suspicious file extensions
-        file_ext = os.path.splitext(file_path)[1].lower()
+        # Slice from the last dot of the basename; cheaper than splitext per event
+        dot = file_path.rfind('.')
+        file_ext = file_path[dot:].lower() if dot > file_path.rfind(os.sep) + 1 else ''
         if file_ext in self.suspicious_extensions:
             result['is_suspicious'] = True
             result['reasons'].append(f"Suspicious extension: {file_ext}")
@@ -181,11 +305,34 @@ class RansomwareDetector:
     
     def _check_raas_pattern(self, file_path: str, fme: float) -> bool:
         """Check for Ransomware-as-a-Service patterns"""
-        # Simple heuristic: multiple files with high entropy in short time
-        with self.abt_algorithm.lock:
-            recent_high_entropy = sum(1 for _, path in self.abt_algorithm.file_events[-10:] 
-                                    if self.fme_calculator.calculate_file_entropy(path) > 7.0)
-            return recent_high_entropy >= 5
+        # Simple heuristic: multiple files with high entropy in short time,
+        # using the FME recorded with each event rather than re-reading files
+        recent_high_entropy = sum(1 for f in self.abt_algorithm.recent_fmes if f > 7.0)
+        return recent_high_entropy >= 5
+
+class _MonitorEventHandler(FileSystemEventHandler):
+    """Forwards watchdog file events to the monitor"""
+    
+    def __init__(self, monitor: "FileSystemMonitor"):
+        self.monitor = monitor
+    
+    def on_created(self, event):
+        if not event.is_directory:
+            self.monitor.submit(event.src_path, 'created')
+    
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.monitor.submit(event.src_path, 'modified')
+    
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.monitor.submit(event.src_path, 'deleted')
+    
+    def on_moved(self, event):
+        # Renames (e.g. foo.docx -> foo.docx.locked) surface as delete + create
+        if not event.is_directory:
+            self.monitor.submit(event.src_path, 'deleted')
+            self.monitor.submit(event.dest_path, 'created')
 
 class FileSystemMonitor:
     """File system event handler for real-time monitoring"""
@@ -193,88 +340,225 @@ class FileSystemMonitor:
     def __init__(self, watch_paths: List[str], detector: RansomwareDetector):
         self.watch_paths = watch_paths
         self.detector = detector
-        self.db_session = SessionLocal()
+        self.db_session = SessionLocal()  # Owned by the writer thread
         self.running = False
+        # Raw (path, action) events awaiting analysis, batched per dispatch tick
+        self._raw_events: queue.Queue = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._dispatch_thread: Optional[threading.Thread] = None
+        # Overlaps entropy sample reads across files during bursts
+        self._io_pool = ThreadPoolExecutor(max_workers=IO_POOL_WORKERS, thread_name_prefix="fme-io")
+        # (file_event, alert_or_None) pairs awaiting a batched commit
+        self._event_queue: queue.Queue = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._writer_thread: Optional[threading.Thread] = None
+        self._writer_stop = threading.Event()
         
     def start_monitoring(self):
         """Start monitoring the specified paths"""
         self.running = True
         logger.info(f"Started monitoring: {self.watch_paths}")
         
-        # Create a simple polling mechanism since watchdog might not be available
-        import threading
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+        self._dispatch_thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatch_thread.start()
         
-        def monitor_loop():
-            last_files = set()
-            while self.running:
-                try:
-                    current_files = set()
-                    for path in self.watch_paths:
-                        if os.path.exists(path):
-                            for root, dirs, files in os.walk(path):
-                                for file in files:
-                                    file_path = os.path.join(root, file)
-                                    current_files.add(file_path)
-                                    
-                                    # Check for new files
-                                    if file_path not in last_files:
-                                        self._process_file_event(file_path, 'created')
-                    
-                    # Check for deleted files
-                    deleted_files = last_files - current_files
-                    for file_path in deleted_files:
-                        self._process_file_event(file_path, 'deleted')
-                    
-                    last_files = current_files
-                    time.sleep(5)  # Poll every 5 seconds
-                    
-                except Exception as e:
-                    logger.error(f"Error in monitoring loop: {e}")
-                    time.sleep(5)
-        
-        self.monitor_thread = threading.Thread(target=monitor_loop, daemon=True)
+        if Observer is not None:
+            # Kernel-delivered events (inotify etc.): no tree rescans, no poll latency
+            observer = Observer()
+            handler = _MonitorEventHandler(self)
+            for path in self.watch_paths:
+                if os.path.isdir(path):
+                    observer.schedule(handler, path, recursive=True)
+                else:
+                    logger.warning(f"Watch path does not exist, skipping: {path}")
+            observer.daemon = True
+            self.monitor_thread = observer
+        else:
+            # watchdog isn't installed; fall back to polling
+            self.monitor_thread = threading.Thread(target=self._poll_loop, daemon=True)
         self.monitor_thread.start()
         logger.info("File system monitoring started")
     
+    def _poll_loop(self):
+        """Periodically rescan the watch paths and diff against the last scan"""
+        last_files = set()
+        while self.running:
+            try:
+                current_files = set()
+                events = []
+                for path in self.watch_paths:
+                    if os.path.exists(path):
+                        for root, dirs, files in os.walk(path):
+                            for file in files:
+                                file_path = os.path.join(root, file)
+                                current_files.add(file_path)
+                                
+                                # Check for new files
+                                if file_path not in last_files:
+                                    events.append((file_path, 'created'))
+                
+                # Check for deleted files
+                deleted_files = last_files - current_files
+                for file_path in deleted_files:
+                    events.append((file_path, 'deleted'))
+                
+                for i in range(0, len(events), DISPATCH_BATCH_SIZE):
+                    self._process_file_events(events[i:i + DISPATCH_BATCH_SIZE])
+                last_files = current_files
+                time.sleep(5)  # Poll every 5 seconds
+                
+            except Exception as e:
+                logger.error(f"Error in monitoring loop: {e}")
+                time.sleep(5)
+    
     def stop_monitoring(self):
         """Stop monitoring"""
         self.running = False
         if hasattr(self, 'monitor_thread'):
+            if Observer is not None:
+                self.monitor_thread.stop()
             self.monitor_thread.join(timeout=5)
-        self.db_session.close()
+        if self._dispatch_thread is None:
+            # Never started, so there is no stage to hand the teardown to
+            self._io_pool.shutdown(wait=True)
+            self.db_session.close()
+            return
+        # Each stage drains what's already queued, then tears down what only it
+        # uses (dispatcher: io pool, then signals the writer; writer: session),
+        # so a join that times out never pulls a resource from a live thread
+        for name, thread in (("dispatcher", self._dispatch_thread), ("writer", self._writer_thread)):
+            thread.join(timeout=5)
+            if thread.is_alive():
+                logger.warning(f"Monitor {name} thread still draining; it will clean up when done")
         logger.info("File system monitoring stopped")
     
-    def _process_file_event(self, file_path: str, action: str):
-        """Process a file event and create alerts if necessary"""
+    def submit(self, file_path: str, action: str):
+        """Queue a raw file event for the dispatcher (blocks the producer when full)"""
+        self._raw_events.put((file_path, action))
+    
+    def _dispatch_loop(self):
+        """Collect raw events per tick and process them as a batch"""
+        try:
+            while self.running or not self._raw_events.empty():
+                try:
+                    batch = [self._raw_events.get(timeout=DISPATCH_INTERVAL)]
+                except queue.Empty:
+                    continue
+                while len(batch) < DISPATCH_BATCH_SIZE:
+                    try:
+                        batch.append(self._raw_events.get_nowait())
+                    except queue.Empty:
+                        break
+                self._process_file_events(batch)
+        finally:
+            # Nothing else maps onto the pool or feeds the writer past this point
+            self._io_pool.shutdown(wait=True)
+            self._writer_stop.set()
+    
+    def _process_file_events(self, events: List[Tuple[str, str]]):
+        """Process a batch of file events, reading their entropy samples in parallel"""
+        # Deleted files have nothing left to sample
+        paths = list(dict.fromkeys(path for path, action in events if action != 'deleted'))
         try:
-            # Always create a file event record
+            fmes = dict(zip(paths, self._io_pool.map(self.detector.fme_calculator.calculate_file_entropy, paths)))
+        except Exception as e:
+            logger.error(f"Error calculating entropy for {len(paths)} files: {e}")
+            fmes = {}
+        
+        # One clock reading per tick, shared by every event in the batch
+        now = datetime.now(timezone.utc)
+        now_ns = time.monotonic_ns()
+        for path, action in events:
+            self._process_file_event(path, action, fmes.get(path, 0.0), now, now_ns)
+    
+    def _process_file_event(self, file_path: str, action: str, fme: Optional[float] = None,
+                            now: Optional[datetime] = None, now_ns: Optional[int] = None):
+        """Analyze a file event and queue its records for the writer thread"""
+        try:
+            # Analyze for ransomware
+            is_suspicious, analysis = self.detector.analyze_file_change(file_path, action, fme, now_ns)
+            if now is None:
+                now = datetime.now(timezone.utc)
+            
+            # Always create a file event record, reusing the FME from the analysis
             file_event = FileEvent(
                 path=file_path,
                 action=FileActionEnum(action),
-                fme=self.detector.fme_calculator.calculate_file_entropy(file_path)
+                fme=analysis['fme'],
+                created_at=now
             )
-            self.db_session.add(file_event)
-            
-            # Analyze for ransomware
-            is_suspicious, analysis = self.detector.analyze_file_change(file_path, action)
             
+            alert = None
             if is_suspicious:
                 alert = Alert(
-                    host=os.uname().nodename,
+                    host=_HOSTNAME,
                     path=file_path,
                     severity=analysis['severity'],
                     fme=analysis['fme'],
                     abt=analysis['abt'],
-                    type=analysis['type']
+                    type=analysis['type'],
+                    created_at=now
                 )
-                self.db_session.add(alert)
                 logger.warning(f"Alert created: {analysis['type']} - {file_path}")
             
-            self.db_session.commit()
+            self._enqueue((file_event, alert))
             
         except Exception as e:
             logger.error(f"Error processing file event {file_path}: {e}")
+    
+    def _enqueue(self, item: Tuple[FileEvent, Optional[Alert]]):
+        """Queue records without blocking the monitor; sheds the oldest on overflow"""
+        while True:
+            try:
+                self._event_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._event_queue.get_nowait()
+                    logger.warning("File event queue full, dropping oldest event")
+                except queue.Empty:
+                    pass
+    
+    def _writer_loop(self):
+        """Drain queued records and commit them in batches"""
+        try:
+            while not self._writer_stop.is_set() or not self._event_queue.empty():
+                try:
+                    batch = [self._event_queue.get(timeout=WRITER_FLUSH_INTERVAL)]
+                except queue.Empty:
+                    continue
+                while len(batch) < WRITER_BATCH_SIZE:
+                    try:
+                        batch.append(self._event_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._write_batch(batch)
+        finally:
+            self.db_session.close()
+    
+    def _write_batch(self, batch: List[Tuple[FileEvent, Optional[Alert]]]):
+        """Insert one batch of events/alerts and their counter deltas in one transaction"""
+        events = [event for event, _ in batch]
+        alerts = [alert for _, alert in batch if alert is not None]
+        try:
+            self.db_session.add_all(events)
+            self.db_session.add_all(alerts)
+            if alerts:
+                self.db_session.execute(increment_statement(
+                    self.db_session.get_bind().dialect.name, deltas_for_alerts(alerts)
+                ))
+            self.db_session.commit()
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} file events: {e}")
             self.db_session.rollback()
+            return
+        
+        for _ in events:
+            recent_events.record()
+        if alerts:
+            metrics_cache.invalidate()
+            for _ in alerts:
+                recent_alerts.record()
 
 # Global monitor instance
 _monitor_instance: Optional[FileSystemMonitor] = None
@@ -287,11 +571,9 @@ def start_file_monitoring(watch_paths: List[str] = None) -> bool:
         logger.warning("File monitoring is already running")
         return False
     
-    if watch_paths is None:
+    if not watch_paths:
         # Default paths to monitor
-        watch_paths = [
-            "/tmp/test_ransomguard"
-        ]
+        watch_paths = [TEST_WATCH_DIR]
     
     try:
         detector = RansomwareDetector()
@@ -325,5 +607,5 @@ def get_monitoring_status() -> Dict:
         "status": "running" if _monitor_instance.running else "stopped",
         "paths": _monitor_instance.watch_paths,
         "abt": _monitor_instance.detector.abt_algorithm.calculate_abt(),
-        "recent_events": len(_monitor_instance.detector.abt_algorithm.file_events)
+        "recent_events": _monitor_instance.detector.abt_algorithm.event_count
     }
@@ -41,6 +41,11 @@ class AlertResponse(AlertBase):
     class Config:
         from_attributes = True
 
+class BulkAlertSpec(BaseModel):
+    """One entry of a bulk test-alert request; unset fields are randomized"""
+    severity: Optional[SeverityEnum] = None
+    type: Optional[AlertTypeEnum] = None
+
 class FileEventBase(BaseModel):
     path: str
     action: FileActionEnum
@@ -1,21 +1,32 @@
-import json
+import orjson
 import asyncio
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from fastapi import WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
 from datetime import datetime
-from enum import Enum
 
 from .database import SessionLocal
 from .models import Alert, FileEvent
 from .schemas import AlertResponse, FileEventResponse
 
+BROADCAST_QUEUE_SIZE = 10_000  # Pending (user_email, frame) pairs
+BROADCAST_BATCH_SIZE = 64  # Messages drained per flush
+
+def _dumps(message: dict) -> str:
+    """Serialize a message to a text frame; enums and datetimes are handled by orjson natively
+
+    Naive datetimes are stored as UTC, so they're tagged as such on the wire.
+    """
+    return orjson.dumps(message, option=orjson.OPT_NAIVE_UTC).decode()
+
 class ConnectionManager:
     """Manages WebSocket connections for real-time updates"""
     
     def __init__(self):
         self.active_connections: List[WebSocket] = []
         self.user_connections: Dict[str, List[WebSocket]] = {}
+        self.broadcast_queue: Optional[asyncio.Queue] = None
+        self.broadcast_task: Optional[asyncio.Task] = None
     
     async def connect(self, websocket: WebSocket, user_email: str):
         """Accept and store WebSocket connection"""
@@ -40,67 +51,100 @@ class ConnectionManager:
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """Send message to specific WebSocket"""
         try:
-            await websocket.send_text(json.dumps(message))
+            await websocket.send_text(_dumps(message))
         except Exception as e:
             print(f"Error sending personal message: {e}")
     
-    async def broadcast_to_user(self, message: dict, user_email: str):
-        """Broadcast message to all connections for a specific user"""
-        if user_email in self.user_connections:
-            disconnected = []
-            for connection in self.user_connections[user_email]:
-                try:
-                    await connection.send_text(json.dumps(message))
-                except Exception as e:
-                    print(f"Error broadcasting to user {user_email}: {e}")
-                    disconnected.append(connection)
-            
-            # Clean up disconnected connections
-            for conn in disconnected:
-                self.disconnect(conn, user_email)
+    def start_broadcaster(self):
+        """Start the broadcast queue drainer on the running event loop"""
+        if self.broadcast_task is not None:
+            return
+        self.broadcast_queue = asyncio.Queue(maxsize=BROADCAST_QUEUE_SIZE)
+        self.broadcast_task = asyncio.get_running_loop().create_task(self._broadcast_loop())
     
-    async def broadcast_new_alert(self, alert: AlertResponse, user_email: str):
-        """Broadcast new alert to user"""
-        def _enum_val(v):
-            return v.value if isinstance(v, Enum) else v
-        message = {
-            "type": "new_alert",
-            "data": {
-                "id": alert.id,
-                "host": alert.host,
-                "path": alert.path,
-                "severity": _enum_val(alert.severity),
-                "fme": alert.fme,
-                "abt": alert.abt,
-                "type": _enum_val(alert.type),
-                "created_at": alert.created_at.isoformat()
-            }
-        }
-        await self.broadcast_to_user(message, user_email)
+    async def stop_broadcaster(self):
+        """Stop the broadcast queue drainer, dropping undelivered messages"""
+        if self.broadcast_task:
+            self.broadcast_task.cancel()
+            try:
+                await self.broadcast_task
+            except asyncio.CancelledError:
+                pass
+            self.broadcast_task = None
+        self.broadcast_queue = None
     
-    async def broadcast_new_file_event(self, event: FileEventResponse, user_email: str):
-        """Broadcast new file event to user"""
-        def _enum_val(v):
-            return v.value if isinstance(v, Enum) else v
-        message = {
-            "type": "new_file_event",
-            "data": {
-                "id": event.id,
-                "path": event.path,
-                "action": _enum_val(event.action),
-                "fme": event.fme,
-                "created_at": event.created_at.isoformat()
-            }
-        }
-        await self.broadcast_to_user(message, user_email)
+    def enqueue(self, frame: str, user_email: str):
+        """Queue a serialized frame for a user without waiting on socket sends"""
+        queue = self.broadcast_queue
+        if queue is None:
+            return
+        if queue.full():
+            # Slow consumers shouldn't stall producers; shed the oldest update
+            queue.get_nowait()
+            print("Broadcast queue full, dropping oldest message")
+        queue.put_nowait((user_email, frame))
+    
+    async def _broadcast_loop(self):
+        """Drain the queue in batches and flush each batch to the sockets"""
+        queue = self.broadcast_queue
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty() and len(batch) < BROADCAST_BATCH_SIZE:
+                batch.append(queue.get_nowait())
+            try:
+                await self.broadcast_batch(batch)
+            except Exception as e:
+                print(f"Error flushing broadcast batch: {e}")
+    
+    async def broadcast_batch(self, batch: List[Tuple[str, str]]):
+        """Send queued frames to every connection of their user
+
+        Connections are flushed concurrently, with frames kept in queue order
+        per connection.
+        """
+        frames: Dict[str, List[str]] = {}
+        for user_email, frame in batch:
+            if user_email in self.user_connections:
+                frames.setdefault(user_email, []).append(frame)
+        
+        targets = [
+            (user_email, connection, user_frames)
+            for user_email, user_frames in frames.items()
+            for connection in list(self.user_connections.get(user_email, ()))
+        ]
+        results = await asyncio.gather(
+            *(self._send_frames(connection, user_frames) for _, connection, user_frames in targets),
+            return_exceptions=True
+        )
+        
+        # Clean up disconnected connections
+        for (user_email, connection, _), result in zip(targets, results):
+            if isinstance(result, Exception):
+                print(f"Error broadcasting to user {user_email}: {result}")
+                self.disconnect(connection, user_email)
+    
+    async def _send_frames(self, connection: WebSocket, frames: List[str]):
+        for frame in frames:
+            await connection.send_text(frame)
+    
+    def broadcast_new_alert(self, alert: Alert, user_email: str):
+        """Queue a new alert broadcast to user"""
+        # pydantic-core serializes the payload; only the envelope is spliced here
+        data = AlertResponse.model_validate(alert).model_dump_json()
+        self.enqueue('{"type":"new_alert","data":' + data + '}', user_email)
+    
+    def broadcast_new_file_event(self, event: FileEvent, user_email: str):
+        """Queue a new file event broadcast to user"""
+        data = FileEventResponse.model_validate(event).model_dump_json()
+        self.enqueue('{"type":"new_file_event","data":' + data + '}', user_email)
     
-    async def broadcast_metrics_update(self, metrics: dict, user_email: str):
-        """Broadcast metrics update to user"""
+    def broadcast_metrics_update(self, metrics: dict, user_email: str):
+        """Queue a metrics update broadcast to user"""
         message = {
             "type": "metrics_update",
             "data": metrics
         }
-        await self.broadcast_to_user(message, user_email)
+        self.enqueue(_dumps(message), user_email)
 
 # Global connection manager
 manager = ConnectionManager()
@@ -5,10 +5,7 @@ import time
 import signal
 import threading
 
-# Add the app directory to the Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
-
-from monitoring import start_file_monitoring, stop_file_monitoring, get_monitoring_status
+from app.monitoring import TEST_WATCH_DIR, start_file_monitoring, stop_file_monitoring, get_monitoring_status
 
 def signal_handler(signum, frame):
     """Handle shutdown signals"""
@@ -26,7 +23,7 @@ def main():
     
     # Define paths to monitor
     watch_paths = [
-        "/tmp/test_ransomguard",
+        TEST_WATCH_DIR,
         os.path.expanduser("~/Documents"),
         os.path.expanduser("~/Downloads"),
     ]
@@ -0,0 +1,25 @@
+from setuptools import Extension, setup
+from setuptools.command.build_ext import build_ext
+
+# Package metadata lives in pyproject.toml; this only declares the optional C
+# entropy kernel used by app/monitoring.py. `pip install -e .` builds it, or
+# build in place with
+#   python setup.py build_ext --inplace
+# A host without a compiler or Python headers still installs; monitoring.py
+# then uses the numba/numpy kernels.
+
+class OptimizingBuildExt(build_ext):
+    """Add -O3 on GCC-style compilers only; MSVC rejects it"""
+
+    def build_extensions(self):
+        if self.compiler.compiler_type != "msvc":
+            for ext in self.extensions:
+                ext.extra_compile_args = ext.extra_compile_args + ["-O3"]
+        super().build_extensions()
+
+setup(
+    ext_modules=[
+        Extension("app._entropy", ["app/_entropy.c"], optional=True),
+    ],
+    cmdclass={"build_ext": OptimizingBuildExt},
+)
@@ -14,6 +14,7 @@ source venv/bin/activate
 # Install dependencies
 echo "Installing dependencies..."
 pip install -r requirements.txt
+pip install -e .
 
 # Start the backend server
 echo "Starting backend server on http://localhost:8000"
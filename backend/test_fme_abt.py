@@ -1,12 +1,10 @@
 #!/usr/bin/env python3
 import os
-import sys
 import math
 
-# Add the app directory to the Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+from test_helpers import TEST_DIR
 
-from monitoring import FileMutationEntropy, AdaptiveBurstThreshold, RansomwareDetector
+from app.monitoring import FileMutationEntropy, AdaptiveBurstThreshold, RansomwareDetector
 
 def test_fme_calculation():
     """Test File Mutation Entropy calculation"""
@@ -27,9 +25,9 @@ def test_fme_calculation():
     
     # Test with actual files
     test_files = [
-        "/tmp/test_ransomguard/normal.txt",
-        "/tmp/test_ransomguard/mixed.dat",
-        "/tmp/test_ransomguard/encrypted.enc"
+        f"{TEST_DIR}/normal.txt",
+        f"{TEST_DIR}/mixed.dat",
+        f"{TEST_DIR}/encrypted.enc"
     ]
     
     for file_path in test_files:
@@ -71,9 +69,9 @@ def test_ransomware_detector():
     detector = RansomwareDetector()
     
     test_files = [
-        ("/tmp/test_ransomguard/normal.txt", "created"),
-        ("/tmp/test_ransomguard/encrypted.enc", "created"),
-        ("/tmp/test_ransomguard/mixed.dat", "modified"),
+        (f"{TEST_DIR}/normal.txt", "created"),
+        (f"{TEST_DIR}/encrypted.enc", "created"),
+        (f"{TEST_DIR}/mixed.dat", "modified"),
     ]
     
     for file_path, action in test_files:
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""File-creation helpers shared by the test scripts"""
+import os
+
+# Fixture directory shared by every test script, on tmpfs where available so
+# fixture writes stay in RAM. app.monitoring's default watch path reads the same
+# variable with the same default, so the monitor and dashboard see these files.
+TEST_DIR = os.getenv(
+    "RANSOMGUARD_TEST_DIR",
+    "/dev/shm/test_ransomguard" if os.path.isdir("/dev/shm") else "/tmp/test_ransomguard",
+)
+
+def write_file(path: str, data, dir_fd=None) -> None:
+    """Write a file with a single write() on a raw fd
+
+    With `dir_fd`, `path` is resolved relative to that open directory (openat),
+    skipping the full pathname lookup.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dir_fd)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+def random_bytes(size: int) -> memoryview:
+    """Read all the random test data in one go, to be sliced per file
+
+    Falls back to os.urandom where /dev/urandom doesn't exist (Windows).
+    """
+    try:
+        with open("/dev/urandom", "rb", buffering=0) as urandom:
+            return memoryview(urandom.read(size))
+    except OSError:
+        return memoryview(os.urandom(size))
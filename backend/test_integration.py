@@ -1,185 +1,322 @@
 #!/usr/bin/env python3
 import os
 import sys
+import logging
 import time
-import json
+import socket
+from urllib.parse import urlencode, urlsplit
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 import asyncio
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import websockets
+from jose import jwt
 
-# Add the app directory to the Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+from test_helpers import TEST_DIR, random_bytes, write_file
 
 API_BASE = "http://localhost:8000"
 WS_BASE = "ws://localhost:8000"
+BULK_ALERT_COUNT = 5
+READY_TIMEOUT = 30.0  # seconds to wait for the backend to come up
+PROBE_TIMEOUT = 0.5  # seconds for the up-front TCP connect
+HTTP_TIMEOUT = (1.0, 5.0)  # (connect, read) seconds for every session request
+TEST_EMAIL = "test@example.com"
+TEST_PASSWORD = "testpassword123"
+
+# JSON request bodies, serialized once up front
+JSON_HEADERS = {"Content-Type": "application/json"}
+REGISTER_BODY = orjson.dumps({
+    "email": TEST_EMAIL,
+    "password": TEST_PASSWORD,
+    "first_name": "Test",
+    "last_name": "User"
+})
+BULK_ALERT_BODY = orjson.dumps([{"severity": "high"} for _ in range(BULK_ALERT_COUNT)])
+
+# Echo probe for the WebSocket; the server reads text frames, so it stays a str
+TEST_MSG = orjson.dumps({"type": "test", "data": "hello"}).decode()
+
+# OAuth2 password form for /token, urlencoded once
+FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+LOGIN_BODY = urlencode({"username": TEST_EMAIL, "password": TEST_PASSWORD}).encode()
+
+log = logging.getLogger("ransomguard.test")
+
+# Filled in once by test_authentication from the issued token
+AUTH_HEADERS = {}
+USER_EMAIL = None
+
+# One keep-alive pool shared by every HTTP call in the run
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+# requests has no default timeout; fail fast instead of hanging on a stuck call
+SESSION.request = partial(SESSION.request, timeout=HTTP_TIMEOUT)
 
 def test_authentication():
     """Test authentication endpoints"""
-    print("Testing Authentication...")
+    global USER_EMAIL
+    log.info("Testing Authentication...")
     
     # Register a test user
-    register_data = {
-        "email": "test@example.com",
-        "password": "testpassword123",
-        "first_name": "Test",
-        "last_name": "User"
-    }
-    
     try:
-        response = requests.post(f"{API_BASE}/register", json=register_data)
+        response = SESSION.post(f"{API_BASE}/register", data=REGISTER_BODY, headers=JSON_HEADERS)
         if response.status_code == 200:
-            print("✓ User registration successful")
+            log.info("✓ User registration successful")
         else:
-            print(f"✗ Registration failed: {response.text}")
+            log.error("✗ Registration failed: %s", response.text)
     except Exception as e:
-        print(f"✗ Registration error: {e}")
+        log.error("✗ Registration error: %s", e)
     
     # Login
-    login_data = {
-        "username": "test@example.com",
-        "password": "testpassword123"
-    }
-    
     try:
-        response = requests.post(f"{API_BASE}/token", data=login_data)
+        response = SESSION.post(f"{API_BASE}/token", data=LOGIN_BODY, headers=FORM_HEADERS)
         if response.status_code == 200:
-            token = response.json()["access_token"]
-            print("✓ Login successful")
+            token = orjson.loads(response.content)["access_token"]
+            # The script only needs the subject; the server verifies the signature
+            USER_EMAIL = jwt.get_unverified_claims(token)["sub"]
+            AUTH_HEADERS["Authorization"] = f"Bearer {token}"
+            SESSION.headers.update(AUTH_HEADERS)
+            log.info("✓ Login successful")
             return token
         else:
-            print(f"✗ Login failed: {response.text}")
+            log.error("✗ Login failed: %s", response.text)
             return None
     except Exception as e:
-        print(f"✗ Login error: {e}")
+        log.error("✗ Login error: %s", e)
         return None
 
-def test_api_endpoints(token):
+def test_api_endpoints():
     """Test API endpoints"""
-    print("\nTesting API Endpoints...")
+    log.info("\nTesting API Endpoints...")
     
-    headers = {"Authorization": f"Bearer {token}"}
+    # The checks are independent; issue them concurrently over the shared pool
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = {
+            name: executor.submit(SESSION.get, f"{API_BASE}/{name}")
+            for name in ("metrics", "alerts", "monitoring/status")
+        }
     
     # Test metrics
     try:
-        response = requests.get(f"{API_BASE}/metrics", headers=headers)
+        response = futures["metrics"].result()
         if response.status_code == 200:
-            print("✓ Metrics endpoint working")
-            print(f"  Total alerts: {response.json()['total_alerts']}")
+            log.info("✓ Metrics endpoint working")
+            log.info("  Total alerts: %s", orjson.loads(response.content)['total_alerts'])
         else:
-            print(f"✗ Metrics endpoint failed: {response.text}")
+            log.error("✗ Metrics endpoint failed: %s", response.text)
     except Exception as e:
-        print(f"✗ Metrics error: {e}")
+        log.error("✗ Metrics error: %s", e)
     
     # Test alerts
     try:
-        response = requests.get(f"{API_BASE}/alerts", headers=headers)
+        response = futures["alerts"].result()
         if response.status_code == 200:
-            alerts = response.json()
-            print(f"✓ Alerts endpoint working ({len(alerts)} alerts)")
+            alerts = orjson.loads(response.content)
+            log.info("✓ Alerts endpoint working (%s alerts)", len(alerts))
         else:
-            print(f"✗ Alerts endpoint failed: {response.text}")
+            log.error("✗ Alerts endpoint failed: %s", response.text)
     except Exception as e:
-        print(f"✗ Alerts error: {e}")
+        log.error("✗ Alerts error: %s", e)
     
     # Test monitoring status
     try:
-        response = requests.get(f"{API_BASE}/monitoring/status", headers=headers)
+        response = futures["monitoring/status"].result()
         if response.status_code == 200:
-            status = response.json()
-            print(f"✓ Monitoring status: {status['status']}")
+            status = orjson.loads(response.content)
+            log.info("✓ Monitoring status: %s", status['status'])
             if 'background_services' in status:
-                print(f"  Background services: {status['background_services']}")
+                log.info("  Background services: %s", status['background_services'])
         else:
-            print(f"✗ Monitoring status failed: {response.text}")
+            log.error("✗ Monitoring status failed: %s", response.text)
     except Exception as e:
-        print(f"✗ Monitoring status error: {e}")
+        log.error("✗ Monitoring status error: %s", e)
 
-async def test_websocket(token):
-    """Test WebSocket connection"""
-    print("\nTesting WebSocket...")
-    
+async def test_websocket(websocket):
+    """Test realtime messages over the shared WebSocket connection"""
     try:
-        # Extract user email from token (simplified)
-        user_email = "test@example.com"
-        ws_url = f"{WS_BASE}/ws/{user_email}"
-        
-        async with websockets.connect(ws_url) as websocket:
-            print("✓ WebSocket connected")
-            
+        # Async HTTP client, so the trigger POST doesn't block websocket.recv()
+        async with httpx.AsyncClient(
+            base_url=API_BASE, headers=AUTH_HEADERS
+        ) as http:
             # Send a test message
-            await websocket.send(json.dumps({"type": "test", "data": "hello"}))
+            await websocket.send(TEST_MSG)
             
             # Wait for response
-            response = await websocket.recv()
-            message = json.loads(response)
-            print(f"✓ WebSocket response: {message}")
+            response = await asyncio.wait_for(websocket.recv(), timeout=2.0)
+            message = orjson.loads(response)
+            log.info("✓ WebSocket response: %s", message)
             
             # Create test data and wait for WebSocket updates
-            print("\nCreating test data...")
-            headers = {"Authorization": f"Bearer {token}"}
+            log.info("\nCreating test data...")
             
             # Create test alert
-            requests.post(f"{API_BASE}/test/alert", headers=headers)
+            await http.post("/test/alert")
             
-            # Wait for WebSocket message
-            response = await websocket.recv()
-            message = json.loads(response)
-            print(f"✓ Received real-time alert: {message['type']}")
+            # Wait for WebSocket message, bounded so a missed push can't hang the run
+            response = await asyncio.wait_for(websocket.recv(), timeout=2.0)
+            message = orjson.loads(response)
+            log.info("✓ Received real-time alert: %s", message['type'])
+            
+            # Create several alerts in one round trip, then expect one push per alert
+            response = await http.post("/test/alerts/bulk", content=BULK_ALERT_BODY, headers=JSON_HEADERS)
+            response.raise_for_status()
+            received = 0
+            while received < BULK_ALERT_COUNT:
+                message = orjson.loads(await asyncio.wait_for(websocket.recv(), timeout=2.0))
+                if message["type"] == "new_alert":
+                    received += 1
+            log.info("✓ Received %s real-time alerts from one bulk request", received)
             
     except Exception as e:
-        print(f"✗ WebSocket error: {e}")
+        log.error("✗ WebSocket error: %s", e)
 
-def test_background_services(token: str):
+def test_background_services():
     """Test background services"""
-    print("\nTesting Background Services...")
+    log.info("\nTesting Background Services...")
     
     # Create some test data to trigger background processes
-    test_dir = "/tmp/test_ransomguard"
-    os.makedirs(test_dir, exist_ok=True)
+    os.makedirs(TEST_DIR, exist_ok=True)
 
     # Ensure monitoring is running
     try:
-        headers = {"Authorization": f"Bearer {token}"}
-        resp = requests.post(f"{API_BASE}/monitoring/start", json=[test_dir], headers=headers)
+        resp = SESSION.post(f"{API_BASE}/monitoring/start", data=orjson.dumps([TEST_DIR]), headers=JSON_HEADERS)
         if resp.status_code == 200:
-            print("✓ Monitoring started")
+            log.info("✓ Monitoring started")
         else:
-            print(f"ℹ Monitoring start response: {resp.status_code} {resp.text}")
+            log.info("ℹ Monitoring start response: %s %s", resp.status_code, resp.text)
     except Exception as e:
-        print(f"ℹ Could not start monitoring: {e}")
+        log.info("ℹ Could not start monitoring: %s", e)
     
-    # Create test files
-    for i in range(5):
-        with open(f"{test_dir}/bg_test_{i}.dat", "wb") as f:
-            f.write(os.urandom(1024))
+    # Newest file event before the test, so new ones can be told apart
+    latest = orjson.loads(SESSION.get(f"{API_BASE}/file-events", params={"limit": 1}).content)
+    baseline_id = latest[0]["id"] if latest else 0
     
-    print("✓ Created test files for background processing")
+    # Create test files from one random buffer, one write() each, overlapped
+    names = [f"bg_test_{i}.dat" for i in range(5)]
+    blob = random_bytes(len(names) * 1024)
+    dir_fd = os.open(TEST_DIR, os.O_DIRECTORY | os.O_RDONLY)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(
+                partial(write_file, dir_fd=dir_fd),
+                names,
+                [blob[i * 1024:(i + 1) * 1024] for i in range(len(names))],
+            ))
+    finally:
+        os.close(dir_fd)
     
-    # Wait a bit for processing
-    time.sleep(2)
+    log.info("✓ Created test files for background processing")
     
-    print("✓ Background services test completed")
+    # Wait until the monitor has recorded every new file, capped at 2s; back off
+    # from 10ms so a fast monitor is seen quickly and a slow one isn't hammered.
+    # A write can yield both created and modified events, so count paths, not events
+    expected = {os.path.join(TEST_DIR, name) for name in names}
+    deadline = time.monotonic() + 2.0
+    delay = 0.01
+    recorded = set()
+    while time.monotonic() < deadline:
+        events = orjson.loads(SESSION.get(f"{API_BASE}/file-events", params={"limit": 50}).content)
+        recorded = {
+            event["path"] for event in events
+            if event["id"] > baseline_id and event["path"] in expected
+        }
+        if recorded == expected:
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 0.2)
+    log.info("✓ Monitor recorded %s of %s test files", len(recorded), len(expected))
+    
+    log.info("✓ Background services test completed")
 
-if __name__ == "__main__":
-    print("=" * 60)
-    print("RansomGuard Integration Test")
-    print("=" * 60)
-    print("Note: Make sure the backend server is running on localhost:8000")
-    print()
+def backend_listening() -> bool:
+    """One TCP connect to the API port, to skip the run when nothing is there"""
+    url = urlsplit(API_BASE)
+    try:
+        socket.create_connection((url.hostname, url.port), timeout=PROBE_TIMEOUT).close()
+        return True
+    except OSError:
+        return False
+
+async def wait_ready():
+    """Poll /health with exponential backoff until the app behind the port answers"""
+    delay = 0.01
+    async with httpx.AsyncClient(base_url=API_BASE) as http:
+        while True:
+            try:
+                response = await http.get("/health")
+                if response.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+async def main():
+    try:
+        await asyncio.wait_for(wait_ready(), READY_TIMEOUT)
+    except asyncio.TimeoutError:
+        log.error("✗ Backend not reachable at %s after %.0fs", API_BASE, READY_TIMEOUT)
+        return
     
     # Test authentication
     token = test_authentication()
+    if not token:
+        return
+    
+    # Before anything else creates alerts or starts the monitor, so the
+    # status and counts it reports are stable across runs
+    await asyncio.to_thread(test_api_endpoints)
+    
+    # One WebSocket held open for the rest of the run
+    log.info("\nTesting WebSocket...")
+    ws_url = f"{WS_BASE}/ws/{USER_EMAIL}?token={token}"
+    websocket = None
+    try:
+        # Small JSON frames gain nothing from deflate, and the session is too
+        # short to need keepalive pings
+        websocket = await websockets.connect(
+            ws_url, compression=None, max_size=1 << 20, max_queue=1024, ping_interval=None
+        )
+        log.info("✓ WebSocket connected")
+    except Exception as e:
+        log.error("✗ WebSocket error: %s", e)
+    
+    # The realtime and background phases don't read each other's state, so
+    # overlap them; the requests-based one runs in a thread so the socket stays serviced
+    phases = [asyncio.to_thread(test_background_services)]
+    if websocket is not None:
+        phases.append(test_websocket(websocket))
+    try:
+        for result in await asyncio.gather(*phases, return_exceptions=True):
+            if isinstance(result, Exception):
+                log.error("✗ Test phase error: %s", result)
+    finally:
+        if websocket is not None:
+            await websocket.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+    # httpx logs every request at INFO; keep the report to the test's own lines
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    
+    log.info("=" * 60)
+    log.info("RansomGuard Integration Test")
+    log.info("=" * 60)
+    log.info("Note: Make sure the backend server is running on localhost:8000")
+    log.info("")
+    
+    if not backend_listening():
+        SESSION.close()
+        sys.exit(f"✗ Backend not running at {API_BASE}, skipping integration tests")
+    
+    try:
+        asyncio.run(main())
+    finally:
+        SESSION.close()
     
-    if token:
-        # Test API endpoints
-        test_api_endpoints(token)
-        
-        # Test WebSocket
-        asyncio.run(test_websocket(token))
-        
-        # Test background services
-        test_background_services(token)
-    
-    print("\n" + "=" * 60)
-    print("Integration test completed!")
-    print("=" * 60)
+    log.info("\n" + "=" * 60)
+    log.info("Integration test completed!")
+    log.info("=" * 60)
@@ -1,57 +1,77 @@
 #!/usr/bin/env python3
 import os
 import sys
+import logging
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-# Add the app directory to the Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+from test_helpers import TEST_DIR, random_bytes, write_file
+
+log = logging.getLogger("ransomguard.test")
 
 def create_test_files():
     """Create test files with different entropy levels"""
-    test_dir = "/tmp/test_ransomguard"
-    
-    # Create a normal text file (low entropy)
-    with open(f"{test_dir}/normal.txt", "w") as f:
-        f.write("This is a normal text file with low entropy.\n")
-        f.write("It contains readable English text.\n")
-        f.write("Entropy should be relatively low.\n")
-    
-    # Create a file with medium entropy (mixed content)
-    with open(f"{test_dir}/mixed.dat", "wb") as f:
-        f.write(b"Normal text" + os.urandom(100) + b"More text" + os.urandom(50))
+    os.makedirs(TEST_DIR, exist_ok=True)
     
-    # Create a high entropy file (encrypted-like)
-    with open(f"{test_dir}/encrypted.enc", "wb") as f:
-        f.write(os.urandom(1024))
+    # One read for all the random content below, carved into per-file views
+    blob = random_bytes(100 + 50 + 1024 + 10 * 512)
     
-    # Create more files to trigger burst detection
-    for i in range(10):
-        with open(f"{test_dir}/burst_{i}.tmp", "wb") as f:
-            f.write(os.urandom(512))
+    # Resolve the directory once; every file below is created relative to it
+    dir_fd = os.open(TEST_DIR, os.O_DIRECTORY | os.O_RDONLY)
+    try:
+        # Create a normal text file (low entropy)
+        write_file("normal.txt", (
+            b"This is a normal text file with low entropy.\n"
+            b"It contains readable English text.\n"
+            b"Entropy should be relatively low.\n"
+        ), dir_fd=dir_fd)
+        
+        # Create a file with medium entropy (mixed content)
+        write_file("mixed.dat", b"Normal text" + blob[0:100] + b"More text" + blob[100:150], dir_fd=dir_fd)
+        
+        # Create a high entropy file (encrypted-like)
+        write_file("encrypted.enc", blob[150:1174], dir_fd=dir_fd)
+        
+        # Create more files to trigger burst detection; the writes are independent, so overlap them
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(
+                partial(write_file, dir_fd=dir_fd),
+                [f"burst_{i}.tmp" for i in range(10)],
+                [blob[1174 + i * 512:1174 + (i + 1) * 512] for i in range(10)],
+            ))
+    finally:
+        os.close(dir_fd)
     
-    print("Test files created in /tmp/test_ransomguard")
+    log.info("Test files created in %s", TEST_DIR)
 
 def simulate_ransomware():
     """Simulate ransomware-like activity"""
-    test_dir = "/tmp/test_ransomguard"
-    
     # Simulate file encryption by overwriting with random data
     files = ["normal.txt", "mixed.dat"]
-    for filename in files:
-        filepath = f"{test_dir}/{filename}"
-        if os.path.exists(filepath):
-            # Create "encrypted" version
-            with open(f"{filepath}.encrypted", "wb") as f:
-                f.write(os.urandom(2048))
-            print(f"Simulated encryption of {filename}")
+    blob = random_bytes(len(files) * 2048)
+    dir_fd = os.open(TEST_DIR, os.O_DIRECTORY | os.O_RDONLY)
+    encrypted = []
+    try:
+        for i, filename in enumerate(files):
+            if os.access(filename, os.F_OK, dir_fd=dir_fd):
+                # Create "encrypted" version
+                write_file(f"{filename}.encrypted", blob[i * 2048:(i + 1) * 2048], dir_fd=dir_fd)
+                encrypted.append(filename)
+    finally:
+        os.close(dir_fd)
+    if encrypted:
+        log.info("Simulated encryption of %s", ", ".join(encrypted))
 
 if __name__ == "__main__":
-    print("Creating test files for ransomware detection...")
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+    
+    log.info("Creating test files for ransomware detection...")
     create_test_files()
     
-    print("\nSimulating ransomware activity...")
+    log.info("\nSimulating ransomware activity...")
     simulate_ransomware()
     
-    print("\nTest files created. Start the monitoring service to detect these changes.")
-    print("Run: python3 -m uvicorn app.main:app --host 0.0.0.0 --port 8000")
+    log.info("\nTest files created. Start the monitoring service to detect these changes.")
+    log.info("Run: python3 -m uvicorn app.main:app --host 0.0.0.0 --port 8000")
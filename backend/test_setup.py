@@ -1,17 +1,30 @@
 #!/usr/bin/env python3
 import sys
-import os
+import importlib.util
 
-# Add the app directory to the Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+# Locate the app modules without importing them (and SQLAlchemy with them);
+# `--check` stops here, for smoke jobs that only need the tree to be importable
+# (find_spec on a submodule imports its parent, so probe `app` itself first)
+if (
+    importlib.util.find_spec("app") is None
+    or importlib.util.find_spec("app.database") is None
+    or importlib.util.find_spec("app.models") is None
+):
+    sys.exit("✗ Error: app package not importable; run from backend/ or pip install -e .")
+if "--check" in sys.argv[1:]:
+    print("✓ App modules found")
+    sys.exit(0)
 
 try:
-    from database import Base, engine
-    from models import User, Alert, FileEvent
+    from app.database import Base, engine
+    from app.models import User, Alert, FileEvent
+    # Standalone entry points import the package too; catch a stale import early
+    import monitor_service
     print("✓ All imports successful")
     
-    # Create tables
-    Base.metadata.create_all(bind=engine)
+    # Create missing tables, all DDL in one transaction
+    with engine.begin() as conn:
+        Base.metadata.create_all(bind=conn, checkfirst=True)
     print("✓ Database tables created successfully")
     
     print("✓ Backend setup complete!")
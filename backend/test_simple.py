@@ -5,6 +5,8 @@ import math
 from datetime import datetime, timedelta
 from typing import List, Tuple
 
+from test_helpers import TEST_DIR
+
 class FileMutationEntropy:
     """Calculate File Mutation Entropy (FME) for ransomware detection"""
     
@@ -111,9 +113,9 @@ def test_fme_calculation():
     
     # Test with actual files
     test_files = [
-        "/tmp/test_ransomguard/normal.txt",
-        "/tmp/test_ransomguard/mixed.dat",
-        "/tmp/test_ransomguard/encrypted.enc"
+        f"{TEST_DIR}/normal.txt",
+        f"{TEST_DIR}/mixed.dat",
+        f"{TEST_DIR}/encrypted.enc"
     ]
     
     for file_path in test_files:
@@ -159,11 +161,11 @@ def analyze_test_files():
     SUSPICIOUS_EXTENSIONS = {'.enc', '.locked', '.crypted', '.crypto', '.ransom'}
     
     test_files = [
-        "/tmp/test_ransomguard/normal.txt",
-        "/tmp/test_ransomguard/mixed.dat",
-        "/tmp/test_ransomguard/encrypted.enc",
-        "/tmp/test_ransomguard/normal.txt.encrypted",
-        "/tmp/test_ransomguard/mixed.dat.encrypted"
+        f"{TEST_DIR}/normal.txt",
+        f"{TEST_DIR}/mixed.dat",
+        f"{TEST_DIR}/encrypted.enc",
+        f"{TEST_DIR}/normal.txt.encrypted",
+        f"{TEST_DIR}/mixed.dat.encrypted"
     ]
     
     for file_path in test_files:
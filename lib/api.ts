@@ -105,7 +105,7 @@ class ApiClient {
   }
 
   // Alerts
-  async getAlerts(params: { skip?: number; limit?: number; severity?: string } = {}) {
+  async getAlerts(params: { after_id?: number; limit?: number; severity?: string } = {}) {
     const query = new URLSearchParams(params as any).toString();
     return this.request(`/alerts${query ? '?' + query : ''}`);
   }
@@ -125,7 +125,7 @@ class ApiClient {
   }
 
   // File Events
-  async getFileEvents(params: { skip?: number; limit?: number } = {}) {
+  async getFileEvents(params: { after_id?: number; limit?: number } = {}) {
     const query = new URLSearchParams(params as any).toString();
     return this.request(`/file-events${query ? '?' + query : ''}`);
   }